@@ -0,0 +1,325 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from startup import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+futures = lazy_import("concurrent.futures")
+urllib_request = lazy_import("urllib.request")
+
+TILE_SIZE = 256
+VARIANTS = ("original", "equalized", "normalized")
+
+
+def is_remote(location):
+    return urlsplit(location).scheme in ("http", "https")
+
+
+def to_gray(image):
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def equalization_lut(gray):
+    # Mirrors cv2.equalizeHist, including its float32 scaling, so one table built at full
+    # resolution can be applied to every pyramid level.
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    cdf = histogram.cumsum()
+    first = np.flatnonzero(histogram)[0]
+    span = cdf[-1] - cdf[first]
+    if span == 0:
+        return np.full(256, first, dtype=np.uint8)
+    scale = np.float32(255.0) / np.float32(span)
+    lut = np.rint((cdf - cdf[first]).astype(np.float32) * scale)
+    lut[:first] = 0
+    return np.clip(lut, 0, 255).astype(np.uint8)
+
+
+def normalization_lut(gray):
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    cdf = histogram.cumsum()
+    return np.uint8(np.round(cdf / cdf.max() * 255))
+
+
+VARIANT_LUTS = {
+    "equalized": equalization_lut,
+    "normalized": normalization_lut,
+}
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by the total size of its values; the newest entry is always kept."""
+
+    def __init__(self, max_bytes, size_of=len):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.size_of(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += self.size_of(value)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= self.size_of(evicted)
+
+    def pop(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.size -= self.size_of(value)
+            return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def image_nbytes(image):
+    return image.nbytes
+
+
+DEFAULT_BASE_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class LocalImageSource:
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+
+    def version(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def read(self):
+        image = cv2.imread(self.path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise IOError(f"Failed to load the image from {self.path}")
+        return image
+
+
+class PyramidLevels:
+    """Decoded levels, lookup tables and sizes for one version of a source."""
+
+    def __init__(self, version):
+        self.version = version
+        self.levels = {}
+        self.luts = {}
+        self.sizes = None
+        self.locks = {}
+        self.guard = threading.Lock()
+
+    def lock_for(self, level):
+        with self.guard:
+            return self.locks.setdefault(level, threading.Lock())
+
+
+class TilePyramid:
+    """Resolution levels of an image source, built on demand and cut into tiles.
+
+    The full-resolution image lives in a byte-bounded LRU that may be shared between slides;
+    the reduced levels, about a third of its size together, stay pinned once built. Lookup
+    tables and sizes are taken from the first full read, and processed variants are derived
+    per tile. A new source version swaps in a fresh PyramidLevels, so nothing stale survives.
+    """
+
+    def __init__(self, source, tile_size=TILE_SIZE, base_cache=None):
+        self.source = source
+        self.tile_size = tile_size
+        self.base_cache = base_cache if base_cache is not None else LRUCache(
+            DEFAULT_BASE_CACHE_BYTES, size_of=image_nbytes
+        )
+        self.current = PyramidLevels(None)
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = self.source.version()
+        current = self.current
+        if version == current.version:
+            return current
+        with self.lock:
+            if self.current.version != version:
+                self.base_cache.pop(self.current)
+                self.current = PyramidLevels(version)
+            return self.current
+
+    def version(self):
+        return self.refresh().version
+
+    def release(self):
+        current = self.current
+        self.base_cache.pop(current)
+        current.levels.clear()
+
+    def read_base(self, levels):
+        image = self.source.read()
+        gray = to_gray(image)
+        levels.luts = {variant: build(gray) for variant, build in VARIANT_LUTS.items()}
+        height, width = image.shape[:2]
+        sizes = [(width, height)]
+        while max(width, height) > self.tile_size:
+            width, height = (width + 1) // 2, (height + 1) // 2
+            sizes.append((width, height))
+        levels.sizes = sizes
+        return image
+
+    def original_level(self, levels, level):
+        image = self.base_cache.get(levels) if level == 0 else levels.levels.get(level)
+        if image is None:
+            # Each level has its own lock, so a decode never blocks version checks, cache hits
+            # or builds of other levels; locks are only ever taken from high levels to low.
+            with levels.lock_for(level):
+                image = self.base_cache.get(levels) if level == 0 else levels.levels.get(level)
+                if image is None:
+                    if level == 0:
+                        image = self.read_base(levels)
+                        self.base_cache.put(levels, image)
+                    else:
+                        image = cv2.pyrDown(self.original_level(levels, level - 1))
+                        levels.levels[level] = image
+        return image
+
+    def level_sizes(self):
+        levels = self.refresh()
+        if levels.sizes is None:
+            self.original_level(levels, 0)
+        return levels.sizes
+
+    def info(self):
+        sizes = self.level_sizes()
+        return {
+            "name": self.source.name,
+            "width": sizes[0][0],
+            "height": sizes[0][1],
+            "tile_size": self.tile_size,
+            "levels": [list(size) for size in sizes],
+            "variants": list(VARIANTS),
+        }
+
+    def display_level(self, max_dimension):
+        sizes = self.level_sizes()
+        for level, (width, height) in enumerate(sizes):
+            if max(width, height) <= max_dimension:
+                return level
+        return len(sizes) - 1
+
+    def apply_variant(self, levels, variant, image):
+        if variant == "original":
+            return image
+        if variant not in VARIANT_LUTS:
+            raise KeyError(f"Unknown image variant {variant!r}")
+        if not levels.luts:
+            self.original_level(levels, 0)
+        return levels.luts[variant][to_gray(image)]
+
+    def level_image(self, variant, level):
+        levels = self.refresh()
+        return self.apply_variant(levels, variant, self.original_level(levels, level))
+
+    def tile(self, variant, level, col, row):
+        if variant not in VARIANTS:
+            raise KeyError(f"Unknown image variant {variant!r}")
+        levels = self.refresh()
+        if levels.sizes is None:
+            self.original_level(levels, 0)
+        sizes = levels.sizes
+        if not 0 <= level < len(sizes):
+            raise KeyError(f"No level {level}")
+        width, height = sizes[level]
+        size = self.tile_size
+        if not (0 <= col and col * size < width and 0 <= row and row * size < height):
+            raise KeyError(f"No tile {col}_{row} at level {level}")
+        image = self.original_level(levels, level)
+        return self.apply_variant(levels, variant, image[row * size:(row + 1) * size, col * size:(col + 1) * size])
+
+
+class RemoteSlide:
+    """A slide served by tile_server.py, read through the same interface as TilePyramid."""
+
+    def __init__(self, url, workers=8, timeout=30):
+        self.url = url.rstrip("/")
+        self.workers = workers
+        self.timeout = timeout
+        self._info = None
+        self.levels = {}
+
+    def fetch(self, path):
+        with urllib_request.urlopen(f"{self.url}/{path}", timeout=self.timeout) as response:
+            return response.read()
+
+    def info(self):
+        if self._info is None:
+            try:
+                info = json.loads(self.fetch("info").decode("utf-8"))
+                if not info["levels"] or any(len(size) != 2 for size in info["levels"]):
+                    raise ValueError("no usable levels")
+                if int(info["tile_size"]) <= 0:
+                    raise ValueError("no usable tile_size")
+            except (ValueError, KeyError, TypeError) as error:
+                raise IOError(f"Malformed slide info from {self.url}: {error!r}") from error
+            self._info = info
+        return self._info
+
+    def release(self):
+        self.levels.clear()
+
+    def level_sizes(self):
+        return [tuple(size) for size in self.info()["levels"]]
+
+    def display_level(self, max_dimension):
+        sizes = self.level_sizes()
+        for level, (width, height) in enumerate(sizes):
+            if max(width, height) <= max_dimension:
+                return level
+        return len(sizes) - 1
+
+    def tile(self, variant, level, col, row):
+        data = self.fetch(f"{variant}/{level}/{col}_{row}.png")
+        tile = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if tile is None:
+            raise IOError(f"Failed to decode tile {col}_{row} from {self.url}")
+        return tile
+
+    def level_image(self, variant, level):
+        key = (variant, level)
+        if key in self.levels:
+            return self.levels[key]
+
+        width, height = self.level_sizes()[level]
+        size = self.info()["tile_size"]
+        positions = [
+            (col, row)
+            for row in range((height + size - 1) // size)
+            for col in range((width + size - 1) // size)
+        ]
+        with futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            tiles = list(executor.map(lambda position: self.tile(variant, level, *position), positions))
+
+        image = np.zeros((height, width) + tiles[0].shape[2:], dtype=tiles[0].dtype)
+        for (col, row), tile in zip(positions, tiles):
+            image[row * size:row * size + tile.shape[0], col * size:col * size + tile.shape[1]] = tile
+        self.levels[key] = image
+        return image
+
+
+def open_slide(location):
+    if is_remote(location):
+        return RemoteSlide(location)
+    return TilePyramid(LocalImageSource(location))
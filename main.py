@@ -1,5 +1,7 @@
+from startup import profiler, profiling_requested
+
+import os
 import sys
-import cv2
 
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (
@@ -7,10 +9,67 @@ from PyQt5.QtWidgets import (
     QGraphicsView, QGraphicsScene, QAction, QFileDialog, QGraphicsItem,
     QButtonGroup, QRadioButton, QGraphicsPixmapItem, QGridLayout, QSizePolicy, QMenu, 
 )
-from PyQt5.QtGui import QPixmap, QPen, QColor, QPainter, QPainterPath, QImage
-from PyQt5.QtCore import Qt, QPointF, QRectF, QSizeF, pyqtSignal
+from PyQt5.QtGui import QPixmap, QPen, QColor, QPainter, QPainterPath, QImage, QBrush
+from PyQt5.QtCore import Qt, QPointF, QRectF, QSizeF, QTimer, pyqtSignal
 from enum import Enum
 
+from image_source import is_remote, open_slide, cv2, np
+from viewport_stats import TileHistogramCache, line_profile
+
+profiler.mark("imports")
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+LOGO_PATH = os.path.join(IMAGES_DIR, "BooleanLab copy.jpeg")
+DEFAULT_IMAGE_PATH = os.path.join(IMAGES_DIR, "cancertissue  copy.png")
+MAX_REMOTE_DIMENSION = 8192
+
+TEAL = "#254783"
+LIGHTGREY = "#CFD9F5"
+DARKGREY = "#E8E8E8"
+BLACK = "#02040A"
+
+APP_STYLESHEET = (
+    f"QWidget#centralWidget {{"
+    f"background-color: white;"
+    f"}}"
+    f"QLabel#headerLabel {{"
+    f"background-color: {TEAL};"
+    f"color: white;"
+    f"font-size: 50px;"
+    f"font-family: 'Arial', Times, serif;"
+    f"font-weight: bold;"
+    f"padding: 10px;"
+    f"border-radius: 10px;"
+    f"}}"
+    f"QLabel#sectionLabel {{"
+    f"font-family: 'Times New Roman', serif;"
+    f"font-size: 20px;"
+    f"color: {TEAL};"
+    f"background-color: {LIGHTGREY};"
+    f"border: 2px solid {BLACK};"
+    f"border-radius: 5px;"
+    f"padding: 10px;"
+    f"}}"
+    f"QLabel#imageLabel, QGraphicsView#normalizedImageView {{"
+    f"background-color: black;"
+    f"}}"
+    f"QPushButton[toolButton=\"true\"], QRadioButton[toolButton=\"true\"] {{"
+    f"background-color: {TEAL};"
+    f"color: white;"
+    f"border: 1px solid white;"
+    f"border-radius: 5px;"
+    f"padding: 10px;"
+    f"}}"
+    f"QPushButton[toolButton=\"true\"]:hover, QRadioButton[toolButton=\"true\"]:hover {{"
+    f"background-color: {LIGHTGREY};"
+    f"color: {TEAL};"
+    f"}}"
+    f"QToolTip {{"
+    f"background-color: white;"
+    f"color: black;"
+    f"}}"
+)
+
 class AnnotationType(Enum):
     NONE = 0
     FREEHAND = 1
@@ -19,6 +78,27 @@ class AnnotationType(Enum):
     RECTANGLE = 4
     TRIANGLE = 5
     ELLIPSE = 6
+    LINE = 7
+
+
+def pixmap_to_gray_array(pixmap):
+    image = pixmap.toImage().convertToFormat(QImage.Format_Grayscale8)
+    width, height, bytes_per_line = image.width(), image.height(), image.bytesPerLine()
+    bits = image.constBits()
+    bits.setsize(bytes_per_line * height)
+    array = np.frombuffer(bits, dtype=np.uint8).reshape(height, bytes_per_line)
+    return array[:, :width].copy()
+
+
+def array_to_pixmap(image):
+    height, width = image.shape[:2]
+    if image.ndim == 2:
+        q_image = QImage(image.data, width, height, image.strides[0], QImage.Format_Grayscale8)
+    else:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        q_image = QImage(image.data, width, height, image.strides[0], QImage.Format_RGB888)
+    return QPixmap.fromImage(q_image)
+
 
 class AnnotationItem(QGraphicsItem):
     removed = pyqtSignal(QGraphicsItem)
@@ -41,6 +121,9 @@ class AnnotationItem(QGraphicsItem):
             self.removed.emit(self)
 
 class AnnotationView(QGraphicsView):
+    viewport_changed = pyqtSignal()
+    profile_line_drawn = pyqtSignal(QPointF, QPointF)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.annotation_type = AnnotationType.NONE
@@ -86,7 +169,8 @@ class AnnotationView(QGraphicsView):
                     AnnotationType.CIRCLE: self.draw_circle,
                     AnnotationType.RECTANGLE: self.draw_rectangle,
                     AnnotationType.TRIANGLE: self.draw_triangle,
-                    AnnotationType.ELLIPSE: self.draw_ellipse
+                    AnnotationType.ELLIPSE: self.draw_ellipse,
+                    AnnotationType.LINE: self.draw_line
                 }
                 if self.current_item:
                     self.scene().removeItem(self.current_item) 
@@ -103,12 +187,15 @@ class AnnotationView(QGraphicsView):
                     AnnotationType.CIRCLE: self.draw_circle,
                     AnnotationType.RECTANGLE: self.draw_rectangle,
                     AnnotationType.TRIANGLE: self.draw_triangle,
-                    AnnotationType.ELLIPSE: self.draw_ellipse
+                    AnnotationType.ELLIPSE: self.draw_ellipse,
+                    AnnotationType.LINE: self.draw_line
                 }
                 self.drawn_paths.append(self.current_item.path)  
                 self.current_item = shape_draw_functions[self.annotation_type](self.start_point, end_point)
                 if self.current_item:
                     self.scene().addItem(self.current_item)
+            if self.annotation_type == AnnotationType.LINE:
+                self.profile_line_drawn.emit(self.start_point, end_point)
 
             delattr(self, 'start_point')  
             self.current_path = None 
@@ -116,6 +203,25 @@ class AnnotationView(QGraphicsView):
 
         super().mouseReleaseEvent(event)
 
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self.viewport_changed.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.viewport_changed.emit()
+
+    def scale(self, sx, sy):
+        super().scale(sx, sy)
+        self.viewport_changed.emit()
+
+    def resetTransform(self):
+        super().resetTransform()
+        self.viewport_changed.emit()
+
+    def visible_scene_rect(self):
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
     def event(self, event):
         if event.type() == QtCore.QEvent.Gesture:
             return self.gestureEvent(event)
@@ -214,24 +320,36 @@ class AnnotationView(QGraphicsView):
         self.annotation_items.append(annotation_item) 
         return annotation_item
 
+    def draw_line(self, start_point, end_point):
+        path = QPainterPath()
+        path.moveTo(start_point)
+        path.lineTo(end_point)
+
+        pen = QPen(QColor("yellow"))
+        pen.setWidth(2)
+        annotation_item = AnnotationItem(path, pen)
+        self.annotation_items.append(annotation_item)
+        return annotation_item
+
 
 class AnnotationMainWindow(QMainWindow):
+    viewport_panel_updated = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.annotation_items = []
         self.drawn_paths = [] 
         self.setWindowTitle("Cancer Tissue Annotation")
         
-        self.teal = "#254783"
-        self.lightgrey = "#CFD9F5"
-        self.darkgrey = "#E8E8E8"
-        self.black = "#02040A"
+        self.teal = TEAL
+        self.lightgrey = LIGHTGREY
+        self.darkgrey = DARKGREY
+        self.black = BLACK
 
         self.central_widget = QWidget(self)
+        self.central_widget.setObjectName("centralWidget")
         self.setCentralWidget(self.central_widget)
 
-        self.central_widget.setStyleSheet("background-color: white;")
-
         self.layout = QGridLayout(self.central_widget)
 
         self.annotation_view = AnnotationView(self)
@@ -244,22 +362,13 @@ class AnnotationMainWindow(QMainWindow):
         self.annotation_view.setScene(self.scene)
         
         self.image_label = QLabel()
-        self.image_label.setStyleSheet("background-color: black;")
+        self.image_label.setObjectName("imageLabel")
 
         self.header_container = QWidget()
         self.header_layout = QVBoxLayout(self.header_container)
 
         self.header_label = QLabel("Cancer Tissue Annotation")
-        self.header_label.setStyleSheet(
-            f"background-color: {self.teal};"
-            "color: white;"
-            "font-size: 50px;"
-            "font-family: 'Arial', Times, serif;"
-            "font-weight: bold;"
-            "padding: 10px;"
-            "border-radius: 10px;"
-            "text-align: center;"
-        )
+        self.header_label.setObjectName("headerLabel")
         self.header_label.setAlignment(Qt.AlignCenter)
 
         self.header_layout.addWidget(self.header_label)
@@ -274,65 +383,39 @@ class AnnotationMainWindow(QMainWindow):
         self.layout.addLayout(self.tool_layout, 1, 1, 1, 1)
 
         self.normalized_image_view = QGraphicsView()
-        self.normalized_image_view.setStyleSheet("background-color: black;")
+        self.normalized_image_view.setObjectName("normalizedImageView")
         self.normalized_image_scene = QGraphicsScene(self)
         self.normalized_image_view.setScene(self.normalized_image_scene)
+        self.normalized_image_view.setFixedHeight(180)
+        self.normalized_image_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.normalized_image_view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.normalized_image_view.setRenderHint(QPainter.Antialiasing, True)
+        self.layout.addWidget(self.normalized_image_view, 2, 0, 1, 1)
+
+        self.histogram_cache = None
+        self.profile_line = None
+        self.viewport_panel_timer = QTimer(self)
+        self.viewport_panel_timer.setSingleShot(True)
+        self.viewport_panel_timer.setInterval(30)
 
         self.layout.setAlignment(Qt.AlignTop)
 
-        button_height = 50
-        button_width = 250
-
-        self.annotation_options_label = QLabel("Image Options")
-        self.annotation_options_label.setStyleSheet(
-            "font-family: 'Times New Roman', serif;"  
-            "font-size: 20px;"  
-            f"color: {self.teal};"  
-            f"background-color: {self.lightgrey};"  
-            f"border: 2px solid {self.black};"  
-            "border-radius: 5px;"  
-            "padding: 10px;"  
-        )
-        self.annotation_options_label.setAlignment(Qt.AlignCenter)
-        self.tool_layout.addWidget(self.annotation_options_label) 
-        self.annotation_options_label.setFixedHeight(button_height)
-        self.annotation_options_label.setFixedWidth(button_width)
+        self.button_height = 50
+        self.button_width = 250
+
+        self.image_options_label = self.add_tool_widget(QLabel("Image Options"), self.tool_layout)
+        self.image_options_label.setObjectName("sectionLabel")
+        self.image_options_label.setAlignment(Qt.AlignCenter)
         self.button_layout = QVBoxLayout()  
 
-        self.fullscreen_button = QPushButton("Fullscreen")
-        self.fullscreen_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.fullscreen_button)
-        self.fullscreen_button.setFixedHeight(button_height)
-        self.fullscreen_button.setFixedWidth(button_width)
-
-        self.zoom_in_button = QPushButton("Zoom In")
-        self.zoom_in_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.zoom_in_button)
-        self.zoom_in_button.setFixedHeight(button_height)
-        self.zoom_in_button.setFixedWidth(button_width)
-
-        self.zoom_out_button = QPushButton("Zoom Out")
-        self.zoom_out_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.zoom_out_button)
-        self.zoom_out_button.setFixedHeight(button_height)
-        self.zoom_out_button.setFixedWidth(button_width)
-
-        self.download_button = QPushButton("Download")
-        self.download_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.download_button)
-        self.download_button.setFixedHeight(button_height)
-        self.download_button.setFixedWidth(button_width)
-
-
-        self.reset_button = QPushButton("Reset Image")
-        self.reset_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.reset_button)
-        self.reset_button.setFixedHeight(button_height)
-        self.reset_button.setFixedWidth(button_width)
+        self.fullscreen_button = self.add_tool_widget(QPushButton("Fullscreen"), self.button_layout)
+        self.zoom_in_button = self.add_tool_widget(QPushButton("Zoom In"), self.button_layout)
+        self.zoom_out_button = self.add_tool_widget(QPushButton("Zoom Out"), self.button_layout)
+        self.download_button = self.add_tool_widget(QPushButton("Download"), self.button_layout)
+        self.reset_button = self.add_tool_widget(QPushButton("Reset Image"), self.button_layout)
 
         self.original_pixmap = None
 
-
         self.tool_layout.addLayout(self.button_layout)
 
         self.annotation_button_group = QButtonGroup(self)
@@ -340,119 +423,23 @@ class AnnotationMainWindow(QMainWindow):
         self.annotation_button_layout = QVBoxLayout() 
         
         #Annotation options heading
-        self.annotation_options_label = QLabel("Annotation Options")
-        self.annotation_options_label.setStyleSheet(
-            "font-family: 'Times New Roman', serif;"  
-            "font-size: 20px;"  
-            f"color: {self.teal};"  
-            f"background-color: {self.lightgrey};"  
-            "border: 2px solid #02040A;"  
-            "border-radius: 5px;"  
-            "padding: 10px;"  
-        )
+        self.annotation_options_label = self.add_tool_widget(QLabel("Annotation Options"), self.tool_layout)
+        self.annotation_options_label.setObjectName("sectionLabel")
         self.annotation_options_label.setAlignment(Qt.AlignCenter)
-        self.tool_layout.addWidget(self.annotation_options_label) 
-        self.annotation_options_label.setFixedHeight(button_height)
-        self.annotation_options_label.setFixedWidth(button_width)
-
-        self.freehand_button = QRadioButton("Freehand")
-        self.freehand_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.freehand_button)
-        self.freehand_button.setFixedHeight(button_height)
-        self.freehand_button.setFixedWidth(button_width)
-
-        self.square_button = QRadioButton("Square")
-        self.square_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.square_button)
-        self.square_button.setFixedHeight(button_height)
-        self.square_button.setFixedWidth(button_width)
-
-        self.circle_button = QRadioButton("Circle")
-        self.circle_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.circle_button)
-        self.circle_button.setFixedHeight(button_height)
-        self.circle_button.setFixedWidth(button_width)
-
-        self.rectangle_button = QRadioButton("Rectangle")
-        self.rectangle_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.rectangle_button)
-        self.rectangle_button.setFixedHeight(button_height)
-        self.rectangle_button.setFixedWidth(button_width)
-
-        self.triangle_button = QRadioButton("Triangle")
-        self.triangle_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.triangle_button)
-        self.triangle_button.setFixedHeight(button_height)
-        self.triangle_button.setFixedWidth(button_width)
-
-        self.ellipse_button = QRadioButton("Ellipse")
-        self.ellipse_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.annotation_button_layout.addWidget(self.ellipse_button)
-        self.ellipse_button.setFixedHeight(button_height)
-        self.ellipse_button.setFixedWidth(button_width)
+
+        self.freehand_button = self.add_tool_widget(QRadioButton("Freehand"), self.annotation_button_layout)
+        self.square_button = self.add_tool_widget(QRadioButton("Square"), self.annotation_button_layout)
+        self.circle_button = self.add_tool_widget(QRadioButton("Circle"), self.annotation_button_layout)
+        self.rectangle_button = self.add_tool_widget(QRadioButton("Rectangle"), self.annotation_button_layout)
+        self.triangle_button = self.add_tool_widget(QRadioButton("Triangle"), self.annotation_button_layout)
+        self.ellipse_button = self.add_tool_widget(QRadioButton("Ellipse"), self.annotation_button_layout)
+        self.line_button = self.add_tool_widget(QRadioButton("Profile Line"), self.annotation_button_layout)
        
-        self.hist_button = QPushButton("Histogram Eq")
-        self.hist_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.hist_button)
-        self.hist_button.setFixedHeight(button_height)
-        self.hist_button.setFixedWidth(button_width)
-
-        self.clear_button = QPushButton("Clear")
-        self.clear_button.setStyleSheet(f"background-color: {self.teal}; color: white;")
-        self.button_layout.addWidget(self.clear_button)
-        self.clear_button.setFixedHeight(button_height)
-        self.clear_button.setFixedWidth(button_width)
+        self.hist_button = self.add_tool_widget(QPushButton("Histogram Eq"), self.button_layout)
+        self.clear_button = self.add_tool_widget(QPushButton("Clear"), self.button_layout)
 
         self.tool_layout.addLayout(self.annotation_button_layout)
 
-        button_style = (
-        f"QPushButton {{"
-        f"background-color: {self.teal};"
-        f"color: white;"  
-        f"border: 1px solid white;"
-        f"border-radius: 5px;"
-        f"padding: 10px;"
-        f"}}"
-        f"QPushButton:hover {{"
-        f"background-color: {self.lightgrey};"
-        f"color: {self.teal};"
-        f"}}"
-        f"QRadioButton {{"
-        f"background-color: {self.teal};"
-        f"color: white;"  
-        f"border: 1px solid white;"
-        f"border-radius: 5px;"
-        f"padding: 10px;"
-        f"}}"
-        f"QRadioButton:hover {{"
-        f"background-color: {self.lightgrey};"
-        f"color: {self.teal};"
-        f"}}"
-        f"QToolTip {{"
-        f"background-color: white;"  
-        f"color: black;" 
-        f"}}"
-    )
-
-        annotation_buttons = [
-            self.fullscreen_button,
-            self.zoom_in_button,
-            self.zoom_out_button,
-            self.download_button,
-            self.clear_button,
-            self.hist_button,
-            self.reset_button,
-            self.freehand_button,
-            self.square_button,
-            self.circle_button,
-            self.rectangle_button,
-            self.triangle_button,
-            self.ellipse_button,
-        ]
-        for button in annotation_buttons:
-            button.setStyleSheet(button_style)
-
-
         self.fullscreen_button.setToolTip("Toggle fullscreen mode")
         self.zoom_in_button.setToolTip("Zoom in on the image")
         self.zoom_out_button.setToolTip("Zoom out on the image")
@@ -466,13 +453,15 @@ class AnnotationMainWindow(QMainWindow):
         self.rectangle_button.setToolTip("Draw rectangular annotations")
         self.triangle_button.setToolTip("Draw triangular annotations")
         self.ellipse_button.setToolTip("Draw elliptical annotations")
+        self.line_button.setToolTip("Draw a line to plot its intensity profile")
 
         self.annotation_type = AnnotationType.NONE
         self.annotation_color = QColor("red")
         self.annotation_items = []
 
-        logo_pixmap = QPixmap("/Users/maana/Downloads/Medical-Image-Analysis-GUI/BooleanLab copy.jpeg")
-        logo_pixmap = logo_pixmap.scaledToWidth(100)
+        logo_pixmap = QPixmap(LOGO_PATH)
+        if not logo_pixmap.isNull():
+            logo_pixmap = logo_pixmap.scaledToWidth(100)
         self.logo_label = QLabel()
         self.logo_label.setPixmap(logo_pixmap)
         self.alignment_widget = QWidget(self)
@@ -483,10 +472,19 @@ class AnnotationMainWindow(QMainWindow):
         self.layout.addWidget(self.alignment_widget, 2, 1, alignment=Qt.AlignBottom | Qt.AlignRight)
 
         self.original_image_path = None
+        self.slide = None
+        self.display_level = 0
 
         self.setup_actions()
         self.connect_signals()
 
+    def add_tool_widget(self, widget, layout):
+        widget.setProperty("toolButton", True)
+        widget.setFixedHeight(self.button_height)
+        widget.setFixedWidth(self.button_width)
+        layout.addWidget(widget)
+        return widget
+
     def setup_actions(self):
         self.zoom_in_action = QAction("Zoom In", self)
         self.zoom_out_action = QAction("Zoom Out", self)
@@ -523,12 +521,32 @@ class AnnotationMainWindow(QMainWindow):
         self.rectangle_button.clicked.connect(lambda: self.annotation_view.set_annotation_type(AnnotationType.RECTANGLE))
         self.triangle_button.clicked.connect(lambda: self.annotation_view.set_annotation_type(AnnotationType.TRIANGLE))
         self.ellipse_button.clicked.connect(lambda: self.annotation_view.set_annotation_type(AnnotationType.ELLIPSE))
+        self.line_button.clicked.connect(lambda: self.annotation_view.set_annotation_type(AnnotationType.LINE))
+
+        self.annotation_view.viewport_changed.connect(self.schedule_viewport_panel_update)
+        self.annotation_view.profile_line_drawn.connect(self.set_profile_line)
+        self.viewport_panel_timer.timeout.connect(self.update_viewport_panel)
 
     def set_image(self, image_path):
-        pixmap = QPixmap(image_path)
+        slide = open_slide(image_path)
+        if is_remote(image_path):
+            try:
+                display_level = slide.display_level(MAX_REMOTE_DIMENSION)
+                pixmap = array_to_pixmap(slide.level_image("original", display_level))
+                slide.release()
+            except (OSError, ValueError, KeyError) as error:
+                print(f"Failed to open {image_path}: {error}")
+                return
+        else:
+            display_level = 0
+            pixmap = QPixmap(image_path)
+        self.slide = slide
+        self.display_level = display_level
         self.original_image_path = image_path
         self.original_pixmap = pixmap
         self.image_label.setPixmap(pixmap)
+        self.histogram_cache = None
+        self.profile_line = None
         self.scene.setSceneRect(0, 0, pixmap.width(), pixmap.height())
         self.annotation_view.resetTransform()
         self.annotation_view.scale(self.initial_zoom_factor, self.initial_zoom_factor)
@@ -542,6 +560,8 @@ class AnnotationMainWindow(QMainWindow):
         image_scene.addItem(image_item)
 
         self.annotation_view.setScene(image_scene)
+        self.profile_line = None
+        self.schedule_viewport_panel_update()
 
     def zoom_in(self):
         self.annotation_view.scale(1.2, 1.2)
@@ -574,20 +594,19 @@ class AnnotationMainWindow(QMainWindow):
 
 
     def apply_histogram_equalization(self):
-        if self.original_image_path:
-            original_image = cv2.imread(self.original_image_path, cv2.IMREAD_GRAYSCALE)
-            if original_image is None:
-                print(f"Failed to load the image from {self.original_image_path}")
+        if self.slide is not None:
+            try:
+                equalized_image = self.slide.level_image("equalized", self.display_level)
+            except OSError as error:
+                print(error)
                 return
 
-            equalized_image = cv2.equalizeHist(original_image)
-            height, width = equalized_image.shape
-            bytes_per_line = width
-            q_image = QImage(equalized_image.data, width, height, bytes_per_line, QImage.Format_Grayscale8)
-
-            pixmap = QPixmap.fromImage(q_image)
+            pixmap = array_to_pixmap(equalized_image)
+            # The pixmap holds its own copy; the decoded levels are not needed until the next click.
+            self.slide.release()
 
             self.image_label.setPixmap(pixmap) 
+            self.histogram_cache = None
             self.scene.setSceneRect(0, 0, pixmap.width(), pixmap.height())
             self.annotation_view.resetTransform()
             self.annotation_view.scale(self.initial_zoom_factor, self.initial_zoom_factor)
@@ -595,17 +614,137 @@ class AnnotationMainWindow(QMainWindow):
     def reset_image(self):
         if self.original_pixmap:
             self.image_label.setPixmap(self.original_pixmap)
+            self.histogram_cache = None
             self.scene.setSceneRect(0, 0, self.original_pixmap.width(), self.original_pixmap.height())
             self.annotation_view.resetTransform()
             self.annotation_view.scale(self.initial_zoom_factor, self.initial_zoom_factor)
 
+    def set_profile_line(self, start_point, end_point):
+        self.profile_line = (QPointF(start_point), QPointF(end_point))
+        self.schedule_viewport_panel_update()
+
+    def schedule_viewport_panel_update(self):
+        # Throttle rather than debounce: a running timer is left alone so the panel keeps
+        # refreshing every interval while the user is still panning or zooming.
+        if not self.viewport_panel_timer.isActive():
+            self.viewport_panel_timer.start()
+
+    def update_viewport_panel(self):
+        pixmap = self.image_label.pixmap()
+        if pixmap is None or pixmap.isNull():
+            self.viewport_panel_updated.emit()
+            return
+        if self.histogram_cache is None:
+            self.histogram_cache = TileHistogramCache(pixmap_to_gray_array(pixmap))
+
+        visible_rect = self.annotation_view.visible_scene_rect()
+        histogram = self.histogram_cache.histogram(
+            visible_rect.left(), visible_rect.top(), visible_rect.right(), visible_rect.bottom()
+        )
+        profile = None
+        if self.profile_line is not None:
+            start_point, end_point = self.profile_line
+            profile = line_profile(
+                self.histogram_cache.image,
+                (start_point.x(), start_point.y()),
+                (end_point.x(), end_point.y()),
+                (visible_rect.left(), visible_rect.top(), visible_rect.right(), visible_rect.bottom()),
+            )
+        self.draw_viewport_panel(histogram, profile)
+        self.viewport_panel_updated.emit()
+
+    def draw_viewport_panel(self, histogram, profile):
+        plot_width = 256
+        plot_height = 100
+        gap = 24
+
+        self.normalized_image_scene.clear()
+        pen = QPen(QColor(self.lightgrey))
+        pen.setCosmetic(True)
+
+        # Log counts so the background peak of a slide does not flatten the tissue range.
+        counts = np.log1p(histogram)
+        peak = counts.max() or 1
+        histogram_path = QPainterPath()
+        histogram_path.moveTo(0, plot_height)
+        for value, count in enumerate(counts):
+            y = plot_height - plot_height * count / peak
+            histogram_path.lineTo(value, y)
+            histogram_path.lineTo(value + 1, y)
+        histogram_path.lineTo(plot_width, plot_height)
+        histogram_path.closeSubpath()
+        self.normalized_image_scene.addPath(histogram_path, pen, QBrush(QColor(self.teal)))
+        self.add_panel_caption("Visible histogram", 0)
+
+        profile_left = plot_width + gap
+        self.normalized_image_scene.addRect(QRectF(profile_left, 0, plot_width, plot_height), pen)
+        if profile is not None and len(profile) > 1:
+            step = plot_width / (len(profile) - 1)
+            profile_path = QPainterPath()
+            for index, value in enumerate(profile):
+                point = QPointF(profile_left + index * step, plot_height - plot_height * int(value) / 255)
+                if index == 0:
+                    profile_path.moveTo(point)
+                else:
+                    profile_path.lineTo(point)
+            profile_pen = QPen(QColor("yellow"))
+            profile_pen.setCosmetic(True)
+            self.normalized_image_scene.addPath(profile_path, profile_pen)
+            self.add_panel_caption("Line profile", profile_left)
+        else:
+            self.add_panel_caption("Line profile (draw a Profile Line)", profile_left)
+
+        panel_rect = QRectF(0, -20, 2 * plot_width + gap, plot_height + 20)
+        self.normalized_image_scene.setSceneRect(panel_rect)
+        self.normalized_image_view.fitInView(panel_rect, Qt.KeepAspectRatio)
+
+    def add_panel_caption(self, text, x):
+        caption = self.normalized_image_scene.addSimpleText(text)
+        caption.setBrush(QBrush(Qt.white))
+        caption.setPos(x, -20)
+
+
+class StartupReport(QtCore.QObject):
+    """Marks the first paint of the image view and the first panel update, then prints the report."""
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.pending = ["first paint", "first panel update"]
+        window.annotation_view.viewport().installEventFilter(self)
+        window.viewport_panel_updated.connect(lambda: self.finish("first panel update"))
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Paint:
+            watched.removeEventFilter(self)
+            # The filter runs before the paint itself, so mark on the next turn once it is done.
+            QTimer.singleShot(0, lambda: self.finish("first paint"))
+        return False
+
+    def finish(self, label):
+        if label in self.pending:
+            self.pending.remove(label)
+            profiler.mark(label)
+            if not self.pending:
+                profiler.report()
+
 
 if __name__ == "__main__":
+    profile_startup = profiling_requested(sys.argv)
+
     app = QApplication(sys.argv)
+    app.setStyleSheet(APP_STYLESHEET)
+    profiler.mark("QApplication")
+
     window = AnnotationMainWindow()
+    profiler.mark("window construction")
+    if profile_startup:
+        startup_report = StartupReport(window)
 
-    image_path = "/Users/maana/Downloads/Medical-Image-Analysis-GUI/MicrosoftTeams-image.png"
+    image_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_IMAGE_PATH
     window.set_image(image_path)
+    profiler.mark("image load")
+
     window.show()
+    profiler.mark("window show")
 
     sys.exit(app.exec_())
@@ -0,0 +1,78 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    def __init__(self, start=PROCESS_START):
+        self.start = start
+        self.last = start
+        self.phases = []
+        self.lazy_loads = []
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.phases.append((label, now - self.last))
+        self.last = now
+
+    def record_lazy_load(self, label, duration):
+        self.lazy_loads.append((label, duration))
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self, stream=None):
+        stream = stream if stream is not None else sys.stderr
+        lines = ["Startup timing:"]
+        for label, duration in self.phases:
+            lines.append(f"  {label:<32} {duration * 1000:8.1f} ms")
+        lines.append(f"  {'total':<32} {self.total() * 1000:8.1f} ms")
+        if self.lazy_loads:
+            lines.append("Lazy loads:")
+            for label, duration in self.lazy_loads:
+                lines.append(f"  {label:<32} {duration * 1000:8.1f} ms")
+        print("\n".join(lines), file=stream)
+
+
+profiler = StartupProfiler()
+
+
+def profiling_requested(argv):
+    if "--profile-startup" in argv:
+        argv.remove("--profile-startup")
+        return True
+    return os.environ.get("MIA_PROFILE_STARTUP", "") not in ("", "0")
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    profiler.record_lazy_load(f"import {self._name}", time.perf_counter() - started)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import image_source
+from image_source import (
+    LocalImageSource,
+    LRUCache,
+    RemoteSlide,
+    TilePyramid,
+    equalization_lut,
+    image_nbytes,
+    is_remote,
+    normalization_lut,
+)
+
+
+def write_image(path, image, mtime_ns=None):
+    cv2.imwrite(str(path), image)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def color_image():
+    return np.random.default_rng(0).integers(0, 256, (700, 900, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_equalization_lut_matches_opencv(seed):
+    rng = np.random.default_rng(seed)
+    low, high = sorted(rng.integers(0, 256, 2))
+    gray = rng.integers(low, high + 1, (int(rng.integers(1, 300)), int(rng.integers(1, 300))), dtype=np.uint8)
+
+    assert (equalization_lut(gray)[gray] == cv2.equalizeHist(gray)).all()
+
+
+def test_equalization_lut_of_constant_image_matches_opencv():
+    gray = np.full((20, 30), 77, dtype=np.uint8)
+    assert (equalization_lut(gray)[gray] == cv2.equalizeHist(gray)).all()
+
+
+def test_normalization_lut_maps_to_full_range():
+    gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    lut = normalization_lut(gray)
+
+    assert lut[255] == 255
+    assert (np.diff(lut.astype(int)) >= 0).all()
+
+
+def test_is_remote():
+    assert is_remote("http://127.0.0.1:8765/slides/a")
+    assert is_remote("https://example.org/slides/a")
+    assert not is_remote("/data/slide.png")
+    assert not is_remote("C:\\slides\\a.png")
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(10)
+    cache.put("a", b"xxxx")
+    cache.put("b", b"xxxx")
+    cache.get("a")
+    cache.put("c", b"xxxx")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"xxxx"
+    assert cache.size == 8
+
+
+def test_lru_cache_pop_updates_size():
+    cache = LRUCache(10)
+    cache.put("a", b"xxxx")
+
+    assert cache.pop("a") == b"xxxx"
+    assert cache.pop("a") is None
+    assert cache.size == 0
+
+
+def test_lru_cache_keeps_newest_entry_even_if_oversized():
+    cache = LRUCache(4)
+    cache.put("a", b"xx")
+    cache.put("big", b"x" * 10)
+
+    assert cache.get("a") is None
+    assert cache.get("big") == b"x" * 10
+
+
+def test_pyramid_levels_and_tiles(tmp_path, color_image):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    pyramid = TilePyramid(LocalImageSource(str(path)))
+
+    assert pyramid.level_sizes() == [(900, 700), (450, 350), (225, 175)]
+    assert (pyramid.tile("original", 0, 1, 2) == color_image[512:700, 256:512]).all()
+
+    gray = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
+    equalized = pyramid.level_image("equalized", 0)
+    assert (equalized == cv2.equalizeHist(gray)).all()
+    assert (pyramid.tile("equalized", 0, 3, 0) == equalized[0:256, 768:900]).all()
+
+    level_one = pyramid.level_image("original", 1)
+    assert level_one.shape == (350, 450, 3)
+    assert (pyramid.tile("normalized", 1, 1, 1) == pyramid.level_image("normalized", 1)[256:, 256:]).all()
+
+
+@pytest.mark.parametrize("address", [("sharpened", 0, 0, 0), ("original", 3, 0, 0), ("original", 0, 4, 0)])
+def test_pyramid_rejects_unknown_tiles(tmp_path, color_image, address):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    with pytest.raises(KeyError):
+        TilePyramid(LocalImageSource(str(path))).tile(*address)
+
+
+def test_pyramid_reloads_when_source_changes(tmp_path, color_image):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image, mtime_ns=1_000_000_000)
+    pyramid = TilePyramid(LocalImageSource(str(path)))
+    old_version = pyramid.version()
+    pyramid.level_image("equalized", 0)
+
+    write_image(path, np.zeros_like(color_image), mtime_ns=2_000_000_000)
+
+    assert pyramid.version() != old_version
+    assert not pyramid.tile("original", 0, 0, 0).any()
+    assert (pyramid.level_image("equalized", 0) == 0).all()
+
+
+class CountingSource(LocalImageSource):
+    def __init__(self, path, started=None, proceed=None):
+        super().__init__(path)
+        self.reads = 0
+        self.started = started
+        self.proceed = proceed
+
+    def read(self):
+        self.reads += 1
+        if self.started is not None:
+            self.started.set()
+            self.proceed.wait(5)
+        return super().read()
+
+
+def test_alternating_levels_decode_the_source_once(tmp_path, color_image):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    source = CountingSource(str(path))
+    pyramid = TilePyramid(source, base_cache=LRUCache(1, size_of=image_nbytes))
+
+    for _ in range(5):
+        pyramid.tile("original", 0, 0, 0)
+        pyramid.tile("equalized", 1, 0, 0)
+        pyramid.tile("normalized", 2, 0, 0)
+
+    assert source.reads == 1
+
+
+def test_shared_base_cache_is_bounded_across_slides(tmp_path, color_image):
+    paths = [tmp_path / "a.png", tmp_path / "b.png"]
+    for path in paths:
+        write_image(path, color_image)
+    base_cache = LRUCache(int(color_image.nbytes * 1.5), size_of=image_nbytes)
+    pyramids = [TilePyramid(LocalImageSource(str(path)), base_cache=base_cache) for path in paths]
+
+    for pyramid in pyramids:
+        pyramid.tile("equalized", 0, 0, 0)
+        pyramid.tile("original", 1, 0, 0)
+
+    assert base_cache.size <= color_image.nbytes * 1.5
+    assert len(base_cache.entries) == 1
+    assert (pyramids[0].tile("original", 1, 0, 0) == pyramids[0].level_image("original", 1)[:256, :256]).all()
+
+
+def test_version_does_not_wait_for_the_first_decode(tmp_path, color_image):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    started, proceed = threading.Event(), threading.Event()
+    pyramid = TilePyramid(CountingSource(str(path), started, proceed))
+    worker = threading.Thread(target=pyramid.tile, args=("original", 0, 0, 0))
+    worker.start()
+    try:
+        assert started.wait(5)
+        began = time.perf_counter()
+        pyramid.version()
+        assert time.perf_counter() - began < 0.5
+    finally:
+        proceed.set()
+        worker.join()
+
+
+def test_level_build_does_not_block_other_requests(tmp_path, color_image, monkeypatch):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    pyramid = TilePyramid(LocalImageSource(str(path)))
+    pyramid.tile("original", 0, 0, 0)
+
+    started, proceed = threading.Event(), threading.Event()
+    pyr_down = cv2.pyrDown
+
+    def slow_pyr_down(image):
+        started.set()
+        proceed.wait(5)
+        return pyr_down(image)
+
+    monkeypatch.setattr(image_source.cv2, "pyrDown", slow_pyr_down)
+    worker = threading.Thread(target=pyramid.tile, args=("original", 1, 0, 0))
+    worker.start()
+    try:
+        assert started.wait(5)
+        began = time.perf_counter()
+        pyramid.version()
+        pyramid.level_sizes()
+        pyramid.tile("equalized", 0, 1, 1)
+        assert time.perf_counter() - began < 0.5
+    finally:
+        proceed.set()
+        worker.join()
+
+
+def test_release_drops_decoded_levels(tmp_path, color_image):
+    path = tmp_path / "slide.png"
+    write_image(path, color_image)
+    pyramid = TilePyramid(LocalImageSource(str(path)))
+    pyramid.level_image("original", 1)
+    pyramid.release()
+
+    assert pyramid.base_cache.size == 0
+    assert not pyramid.current.levels
+    assert (pyramid.level_image("equalized", 0) == cv2.equalizeHist(cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY))).all()
+
+
+@pytest.mark.parametrize("body", [b"<html>not json</html>", b"{}", b'{"levels": [], "tile_size": 256}', b"[1, 2]"])
+def test_remote_slide_rejects_malformed_info(monkeypatch, body):
+    slide = RemoteSlide("http://127.0.0.1:1/slides/x")
+    monkeypatch.setattr(slide, "fetch", lambda path: body)
+
+    with pytest.raises(IOError):
+        slide.level_sizes()
@@ -0,0 +1,69 @@
+import io
+
+import startup
+from startup import LazyModule, StartupProfiler, profiling_requested
+
+
+def test_mark_records_time_since_previous_mark():
+    profiler = StartupProfiler(start=0.0)
+    profiler.mark("imports")
+    profiler.mark("window")
+
+    labels = [label for label, _ in profiler.phases]
+    assert labels == ["imports", "window"]
+    assert all(duration >= 0 for _, duration in profiler.phases)
+    assert abs(sum(duration for _, duration in profiler.phases) - profiler.total()) < 1e-9
+
+
+def test_report_lists_phases_total_and_lazy_loads():
+    profiler = StartupProfiler(start=0.0)
+    profiler.mark("imports")
+    profiler.record_lazy_load("import cv2", 0.25)
+    stream = io.StringIO()
+    profiler.report(stream)
+
+    output = stream.getvalue()
+    assert "imports" in output
+    assert "total" in output
+    assert "Lazy loads:" in output
+    assert "import cv2" in output
+    assert "250.0 ms" in output
+
+
+def test_report_omits_lazy_section_when_nothing_was_loaded():
+    profiler = StartupProfiler(start=0.0)
+    profiler.mark("imports")
+    stream = io.StringIO()
+    profiler.report(stream)
+
+    assert "Lazy loads:" not in stream.getvalue()
+
+
+def test_lazy_module_imports_on_first_attribute_access(monkeypatch):
+    profiler = StartupProfiler()
+    monkeypatch.setattr(startup, "profiler", profiler)
+    module = LazyModule("colorsys")
+
+    assert "not loaded" in repr(module)
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "(loaded)" in repr(module)
+    assert [label for label, _ in profiler.lazy_loads] == ["import colorsys"]
+
+    module.hsv_to_rgb(0.0, 1.0, 1.0)
+    assert len(profiler.lazy_loads) == 1
+
+
+def test_profiling_requested_consumes_flag(monkeypatch):
+    monkeypatch.delenv("MIA_PROFILE_STARTUP", raising=False)
+    argv = ["main.py", "--profile-startup", "slide.png"]
+
+    assert profiling_requested(argv)
+    assert argv == ["main.py", "slide.png"]
+    assert not profiling_requested(argv)
+
+
+def test_profiling_requested_from_environment(monkeypatch):
+    monkeypatch.setenv("MIA_PROFILE_STARTUP", "1")
+    assert profiling_requested(["main.py"])
+    monkeypatch.setenv("MIA_PROFILE_STARTUP", "0")
+    assert not profiling_requested(["main.py"])
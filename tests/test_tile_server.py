@@ -0,0 +1,109 @@
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+from tile_server import TileCache, TileServer, load_slides
+
+
+def write_image(path, image, mtime_ns):
+    cv2.imwrite(str(path), image)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(1, 256, (300, 400, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def served(tmp_path, image):
+    path = tmp_path / "slide one.png"
+    write_image(path, image, 1_000_000_000)
+    server = TileServer(("127.0.0.1", 0), load_slides([str(path)]), TileCache())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path, server, f"http://127.0.0.1:{server.server_port}/slides/slide-one"
+    server.shutdown()
+    server.server_close()
+
+
+def test_tile_cache_is_bounded_by_bytes():
+    cache = TileCache(max_bytes=6)
+    cache.put("a", b"abc")
+    cache.put("b", b"def")
+    cache.put("c", b"ghi")
+
+    assert cache.get("a") is None
+    assert cache.get("c") == b"ghi"
+    assert cache.size == 6
+
+
+def test_lists_slides_and_info(served):
+    _, server, url = served
+    status, _, body = get(f"http://127.0.0.1:{server.server_port}/slides")
+    assert status == 200
+    assert b"slide-one" in body
+
+    status, headers, body = get(f"{url}/info")
+    assert status == 200
+    assert headers["ETag"]
+    assert b'"width": 400' in body
+
+
+def test_serves_tiles_with_caching_headers(served, image):
+    _, _, url = served
+    status, headers, body = get(f"{url}/original/0/1_0.png")
+
+    assert status == 200
+    assert headers["Content-Type"] == "image/png"
+    assert "max-age" in headers["Cache-Control"]
+    tile = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    assert (tile == image[0:256, 256:400]).all()
+
+    status, headers, body = get(f"{url}/original/0/1_0.png", {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert body == b""
+
+
+@pytest.mark.parametrize("path", ["original/0/9_0.png", "sharpened/0/0_0.png", "original/x/0_0.png", "info/extra"])
+def test_unknown_resources_are_not_found(served, path):
+    _, _, url = served
+    assert get(f"{url}/{path}")[0] == 404
+
+
+def test_overwritten_source_gets_new_etag_and_new_pixels(served, image):
+    path, _, url = served
+    _, old_headers, _ = get(f"{url}/original/0/0_0.png")
+
+    write_image(path, np.zeros_like(image), 2_000_000_000)
+    status, headers, body = get(f"{url}/original/0/0_0.png", {"If-None-Match": old_headers["ETag"]})
+
+    assert status == 200
+    assert headers["ETag"] != old_headers["ETag"]
+    tile = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    assert not tile.any()
+
+
+def test_duplicate_slide_ids_are_rejected(tmp_path, image):
+    for name in ("a/x.png", "b/x.png", "a b.png", "a-b.png"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        write_image(tmp_path / name, image, 1_000_000_000)
+
+    with pytest.raises(ValueError):
+        load_slides([str(tmp_path / "a/x.png"), str(tmp_path / "b/x.png")])
+    with pytest.raises(ValueError):
+        load_slides([str(tmp_path / "a b.png"), str(tmp_path / "a-b.png")])
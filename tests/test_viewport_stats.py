@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from viewport_stats import TileHistogramCache, line_profile
+
+
+def expected_histogram(image, left, top, right, bottom):
+    height, width = image.shape
+    region = image[max(top, 0):min(bottom + 1, height), max(left, 0):min(right + 1, width)]
+    return np.bincount(region.ravel(), minlength=256)
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (2000, 3000), dtype=np.uint8)
+
+
+def test_histogram_counts_exactly_the_visible_pixels(image):
+    cache = TileHistogramCache(image)
+    histogram = cache.histogram(100, 50, 1099, 849)
+
+    assert histogram.sum() == 1000 * 800
+    assert (histogram == expected_histogram(image, 100, 50, 1099, 849)).all()
+
+
+@pytest.mark.parametrize("viewport", [
+    (0, 0, 2999, 1999),
+    (-50, -50, 3100, 2100),
+    (10, 10, 40, 40),
+    (0, 0, 255, 255),
+    (255, 0, 256, 1999),
+    (2900, 1900, 3500, 2500),
+    (4000, 0, 4100, 100),
+])
+def test_histogram_matches_direct_count_at_edges(image, viewport):
+    cache = TileHistogramCache(image)
+    assert (cache.histogram(*viewport) == expected_histogram(image, *viewport)).all()
+
+
+def test_histogram_stays_exact_while_panning_incrementally(image):
+    cache = TileHistogramCache(image)
+    rng = np.random.default_rng(1)
+    left, top = 300, 200
+    for _ in range(100):
+        left += int(rng.integers(-80, 81))
+        top += int(rng.integers(-80, 81))
+        viewport = (left, top, left + 1200, top + 900)
+        assert (cache.histogram(*viewport) == expected_histogram(image, *viewport)).all()
+
+
+def test_only_fully_covered_tiles_are_cached(image):
+    cache = TileHistogramCache(image)
+    cache.histogram(100, 100, 900, 900)
+
+    assert set(cache.tile_histograms) == {(1, 1), (1, 2), (2, 1), (2, 2)}
+
+
+def test_line_profile_samples_along_the_line():
+    image = np.tile(np.arange(100, dtype=np.uint8), (50, 1))
+    profile = line_profile(image, (0, 10), (99, 10), (0, 0, 99, 49))
+
+    assert list(profile) == list(range(100))
+
+
+def test_line_profile_is_clipped_to_the_visible_rect():
+    image = np.tile(np.arange(100, dtype=np.uint8), (50, 1))
+    profile = line_profile(image, (0, 10), (99, 10), (20, 0, 39, 49))
+
+    assert list(profile) == list(range(20, 40))
+    assert len(line_profile(image, (0, 10), (99, 10), (0, 20, 99, 49))) == 0
@@ -0,0 +1,147 @@
+import argparse
+import json
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from image_source import LRUCache, LocalImageSource, TilePyramid, cv2, image_nbytes
+
+TILE_PATTERN = re.compile(r"^(\d+)_(\d+)\.png$")
+TILE_CACHE_CONTROL = "public, max-age=86400"
+
+
+class TileCache(LRUCache):
+    """Encoded tiles, bounded by their total byte size."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        super().__init__(max_bytes)
+
+
+class TileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, slides, cache):
+        super().__init__(address, TileRequestHandler)
+        self.slides = slides
+        self.cache = cache
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = [part for part in urlsplit(self.path).path.split("/") if part]
+        try:
+            if parts == ["slides"]:
+                self.send_json({"slides": sorted(self.server.slides)})
+            elif len(parts) == 3 and parts[0] == "slides" and parts[2] == "info":
+                self.send_info(self.find_slide(parts[1]))
+            elif len(parts) == 5 and parts[0] == "slides":
+                self.send_tile(self.find_slide(parts[1]), parts[1], parts[2], parts[3], parts[4])
+            else:
+                self.send_error(HTTPStatus.NOT_FOUND)
+        except KeyError as error:
+            self.send_error(HTTPStatus.NOT_FOUND, error.args[0])
+        except OSError as error:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(error))
+
+    def find_slide(self, slide_id):
+        slide = self.server.slides.get(slide_id)
+        if slide is None:
+            raise KeyError(f"No slide {slide_id!r}")
+        return slide
+
+    def not_modified(self, etag):
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        return False
+
+    def send_body(self, body, content_type, etag=None, cache_control="no-cache"):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload, etag=None):
+        self.send_body(json.dumps(payload).encode("utf-8"), "application/json", etag)
+
+    def send_info(self, slide):
+        etag = f'"{slide.version()}"'
+        if not self.not_modified(etag):
+            self.send_json(slide.info(), etag)
+
+    def send_tile(self, slide, slide_id, variant, level, tile_name):
+        match = TILE_PATTERN.match(tile_name)
+        if not match or not level.isdigit():
+            raise KeyError(f"No tile {tile_name}")
+        level, col, row = int(level), int(match.group(1)), int(match.group(2))
+
+        # The ETag only depends on the source file and tile address, so revalidation never renders.
+        etag = f'"{slide.version()}-{variant}-{level}-{col}-{row}"'
+        if self.not_modified(etag):
+            return
+
+        key = (slide_id, etag)
+        data = self.server.cache.get(key)
+        if data is None:
+            ok, encoded = cv2.imencode(".png", slide.tile(variant, level, col, row))
+            if not ok:
+                raise OSError(f"Failed to encode tile {tile_name}")
+            data = encoded.tobytes()
+            self.server.cache.put(key, data)
+        self.send_body(data, "image/png", etag, TILE_CACHE_CONTROL)
+
+
+def load_slides(paths, max_level_bytes=512 * 1024 * 1024):
+    # One budget for the decoded full-resolution images of all slides; reduced levels are
+    # pinned per slide and not counted against it.
+    base_cache = LRUCache(max_level_bytes, size_of=image_nbytes)
+    slides = {}
+    for path in paths:
+        source = LocalImageSource(path)
+        slide_id = re.sub(r"[^A-Za-z0-9_.-]+", "-", source.name)
+        if slide_id in slides:
+            raise ValueError(
+                f"{slides[slide_id].source.path} and {path} would both be served as slide {slide_id!r}"
+            )
+        slides[slide_id] = TilePyramid(source, base_cache=base_cache)
+    return slides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve image tiles to remote viewers.")
+    parser.add_argument("images", nargs="+", help="image files to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-mb", type=int, default=256, help="in-memory encoded tile cache size")
+    parser.add_argument(
+        "--level-cache-mb", type=int, default=512, help="decoded full-resolution images kept across slides"
+    )
+    args = parser.parse_args()
+
+    try:
+        slides = load_slides(args.images, args.level_cache_mb * 1024 * 1024)
+    except ValueError as error:
+        parser.error(str(error))
+    server = TileServer((args.host, args.port), slides, TileCache(args.cache_mb * 1024 * 1024))
+    for slide_id in sorted(slides):
+        print(f"Serving http://{args.host}:{server.server_port}/slides/{slide_id}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
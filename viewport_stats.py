@@ -0,0 +1,90 @@
+import math
+
+from startup import lazy_import
+
+np = lazy_import("numpy")
+
+
+class TileHistogramCache:
+    """Per-tile intensity histograms of a grayscale image, merged on demand for a viewport."""
+
+    def __init__(self, image, tile_size=256):
+        self.image = image
+        self.tile_size = tile_size
+        self.tile_histograms = {}
+        self.interior_tiles = set()
+        self.interior_histogram = np.zeros(256, dtype=np.int64)
+
+    def tile_histogram(self, key):
+        histogram = self.tile_histograms.get(key)
+        if histogram is None:
+            row, col = key
+            size = self.tile_size
+            tile = self.image[row * size:(row + 1) * size, col * size:(col + 1) * size]
+            histogram = np.bincount(tile.ravel(), minlength=256).astype(np.int64)
+            self.tile_histograms[key] = histogram
+        return histogram
+
+    def count(self, top, bottom, left, right):
+        if bottom <= top or right <= left:
+            return np.zeros(256, dtype=np.int64)
+        return np.bincount(self.image[top:bottom, left:right].ravel(), minlength=256).astype(np.int64)
+
+    def histogram(self, left, top, right, bottom):
+        height, width = self.image.shape
+        left, top = max(int(left), 0), max(int(top), 0)
+        right, bottom = min(int(right) + 1, width), min(int(bottom) + 1, height)
+        if right <= left or bottom <= top:
+            return np.zeros(256, dtype=np.int64)
+
+        # Tiles lying entirely inside the viewport come from the cache; the partly covered
+        # tiles around the edge are counted directly so the result stays exact.
+        size = self.tile_size
+        first_row, first_col = -(-top // size), -(-left // size)
+        last_row = -(-height // size) if bottom == height else bottom // size
+        last_col = -(-width // size) if right == width else right // size
+        inner_top, inner_left = first_row * size, first_col * size
+        inner_bottom, inner_right = min(last_row * size, height), min(last_col * size, width)
+        if inner_bottom <= inner_top or inner_right <= inner_left:
+            return self.count(top, bottom, left, right)
+
+        tiles = {
+            (row, col)
+            for row in range(first_row, last_row)
+            for col in range(first_col, last_col)
+        }
+        added = tiles - self.interior_tiles
+        removed = self.interior_tiles - tiles
+        if len(added) + len(removed) < len(tiles):
+            interior = self.interior_histogram.copy()
+            for key in removed:
+                interior -= self.tile_histograms[key]
+        else:
+            interior = np.zeros(256, dtype=np.int64)
+            added = tiles
+        for key in added:
+            interior += self.tile_histogram(key)
+        self.interior_tiles = tiles
+        self.interior_histogram = interior
+
+        return (
+            interior
+            + self.count(top, inner_top, left, right)
+            + self.count(inner_bottom, bottom, left, right)
+            + self.count(inner_top, inner_bottom, left, inner_left)
+            + self.count(inner_top, inner_bottom, inner_right, right)
+        )
+
+
+def line_profile(image, start_point, end_point, visible_rect):
+    height, width = image.shape
+    (x0, y0), (x1, y1) = start_point, end_point
+    left, top, right, bottom = visible_rect
+    samples = int(math.hypot(x1 - x0, y1 - y0)) + 1
+    xs = np.linspace(x0, x1, samples)
+    ys = np.linspace(y0, y1, samples)
+    inside = (
+        (xs >= max(left, 0)) & (xs <= min(right, width - 1))
+        & (ys >= max(top, 0)) & (ys <= min(bottom, height - 1))
+    )
+    return image[ys[inside].round().astype(int), xs[inside].round().astype(int)]